@@ -6,20 +6,315 @@
 #
 ################################################################################
 from abc import ABC, abstractmethod
-import time
-from pysat.formula import IDPool
-from pysat.solvers import Solver as SAT_Solver
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import random
+from time import perf_counter
 ################################################################################
 
 
+def _split(res):
+    """
+        Split the result of waxp/wcxp into (result, core),
+        core being None if the oracle returned a plain result.
+    """
+    if isinstance(res, tuple):
+        return res
+    return res, None
+
+
+def _qxp(oracle, feats, *additional_info):
+    """
+        QuickExplain, run iteratively with an explicit stack.
+        The background B is kept in one list extended and truncated as in a DFS,
+        and each Z is a range [lo, hi) of feats, so no sub-list is concatenated.
+
+        :param oracle: a bound _waxp or _wcxp, called with a copy of the background,
+                        so user oracles may modify or keep their argument.
+        :param feats: a list of features.
+        :param additional_info: additional information.
+        :return: one explanation contained in feats.
+    """
+    base = []
+    # frames (lo, hi, newB, stage, base_len, Q2), stage 0 means not started
+    stack = [(0, len(feats), False, 0, 0, None)]
+    ret = None
+    while stack:
+        lo, hi, newB, stage, base_len, Q2 = stack.pop()
+        if stage == 0:
+            if newB and oracle(base[:], *additional_info):
+                ret = []
+                continue
+            lz = hi - lo
+            if lz <= 1:
+                ret = feats[lo:hi]
+                continue
+            u = lo + (lz >> 1)
+            # Q2 = qxp(B + Z1, Z2), Z1 is never empty here
+            base_len = len(base)
+            base.extend(feats[lo:u])
+            stack.append((lo, hi, newB, 1, base_len, None))
+            stack.append((u, hi, True, 0, 0, None))
+        elif stage == 1:
+            # Q1 = qxp(B + Q2, Z1)
+            Q2 = ret
+            del base[base_len:]
+            base.extend(Q2)
+            u = lo + ((hi - lo) >> 1)
+            stack.append((lo, hi, newB, 2, base_len, Q2))
+            stack.append((lo, u, bool(Q2), 0, 0, None))
+        else:
+            del base[base_len:]
+            ret = ret + Q2
+    return ret
+
+
+class _LRUCache(OrderedDict):
+    """
+        Dict keeping at most maxsize entries (None means no limit),
+        the least recently used one is evicted first.
+    """
+
+    def __init__(self, maxsize=None):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if self.maxsize is not None and len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+# Numba deletion loop, compiled on first use (False if Numba is not installed)
+_del_njit = None
+
+
+def _get_del_njit():
+    """
+        Import Numba and compile the deletion loop, only once a jitted oracle is used.
+        :return: the compiled function, or None if Numba is not installed.
+    """
+    global _del_njit
+    if _del_njit is None:
+        try:
+            import numpy as np
+            from numba import njit
+        except ImportError:
+            _del_njit = False
+        else:
+            @njit
+            def del_njit(feats, oracle, additional_info):
+                """
+                    Deletion based algorithm compiled by Numba.
+
+                    :param feats: an int64 array of features.
+                    :param oracle: a jitted oracle, called with an int64 array of features
+                                    and the additional information.
+                    :param additional_info: a tuple of additional information.
+                    :return: an int64 array, one explanation contained in feats.
+                """
+                present = np.ones(feats.shape[0], dtype=np.bool_)
+                for k in range(feats.shape[0]):
+                    present[k] = False
+                    if not oracle(feats[present], *additional_info):
+                        present[k] = True
+                return feats[present]
+
+            _del_njit = del_njit
+    return _del_njit or None
+
+
+class MapSolver(ABC):
+    """
+        Map solver of MARCO, keeps track of the subsets of features not explored yet.
+        A seed is given by its universal features, the other features are fixed.
+    """
+
+    @abstractmethod
+    def solve(self):
+        """
+            Look for an unexplored seed.
+            :return: true if there is one.
+        """
+        pass
+
+    @abstractmethod
+    def model(self):
+        """
+            :return: the universal features of the last seed found.
+        """
+        pass
+
+    @abstractmethod
+    def block_axp(self, axp):
+        """
+            Block all seeds fixing every feature of axp (free one feature next time).
+            :param axp: an AXp.
+        """
+        pass
+
+    @abstractmethod
+    def block_cxp(self, cxp):
+        """
+            Block all seeds freeing every feature of cxp (fix one feature next time).
+            :param cxp: a CXp.
+        """
+        pass
+
+    def delete(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.delete()
+
+
+class PySatMapSolver(MapSolver):
+    """
+        Map solver backed by a PySAT solver, one variable u_i per feature, true if universal.
+        Blocking clauses only accumulate, so the solver is used incrementally
+        and keeps its learned clauses over the whole enumeration.
+    """
+
+    def __init__(self, feats_idx, name='cadical153', incremental=True):
+        """
+        :param feats_idx: set of feature indices
+        :param name: name of the PySAT solver
+        :param incremental: enable the incremental mode of Glucose (ignored by other solvers)
+        """
+        from pysat.formula import IDPool
+        from pysat.solvers import Solver as SAT_Solver, SolverNames
+
+        vpool = IDPool()
+        # PySAT variable of each feature, and back
+        self.lit_of = {i: vpool.id(f'u_{i}') for i in feats_idx}
+        self.var_to_feat = {v: i for i, v in self.lit_of.items()}
+        if incremental and name in SolverNames.glucose3 + SolverNames.glucose4:
+            self.slv = SAT_Solver(name=name, incr=True)
+        else:
+            self.slv = SAT_Solver(name=name)
+
+    def solve(self):
+        return self.slv.solve()
+
+    def model(self):
+        # first model is empty, lit > 0 means universal
+        return [self.var_to_feat[lit] for lit in self.slv.get_model() if lit > 0]
+
+    def block_axp(self, axp):
+        self.slv.add_clause([self.lit_of[i] for i in axp])
+
+    def block_cxp(self, cxp):
+        self.slv.add_clause([-self.lit_of[i] for i in cxp])
+
+    def delete(self):
+        self.slv.delete()
+
+
+class BitmapMapSolver(MapSolver):
+    """
+        Pure-Python map solver for a few features,
+        marks the 2^n seeds in a bitmap and scans it for an unvisited one.
+        Each seed returned is blocked right after by enum,
+        so the scan never goes back.
+    """
+    max_feats = 16
+
+    def __init__(self, feats_idx):
+        """
+        :param feats_idx: set of feature indices, at most max_feats of them
+        """
+        if len(feats_idx) > self.max_feats:
+            raise ValueError(f'BitmapMapSolver supports at most {self.max_feats} features')
+        self.feats = list(feats_idx)
+        self.bit_of = {i: 1 << b for b, i in enumerate(self.feats)}
+        self.full = (1 << len(self.feats)) - 1
+        # seed s has feature feats[b] universal iff bit b of s is set
+        self.visited = bytearray(self.full + 1)
+        self.seed = 0
+
+    def solve(self):
+        self.seed = self.visited.find(0, self.seed)
+        return self.seed >= 0
+
+    def model(self):
+        return [i for b, i in enumerate(self.feats) if self.seed >> b & 1]
+
+    def _mark(self, base, free):
+        # visit base | s for every s included in free
+        s = free
+        while True:
+            self.visited[base | s] = 1
+            if s == 0:
+                break
+            s = (s - 1) & free
+
+    def block_axp(self, axp):
+        mask = 0
+        for i in axp:
+            mask |= self.bit_of[i]
+        self._mark(0, self.full & ~mask)
+
+    def block_cxp(self, cxp):
+        mask = 0
+        for i in cxp:
+            mask |= self.bit_of[i]
+        self._mark(mask, self.full & ~mask)
+
+
 class LogicXplainer(ABC):
-    def __init__(self, custom_object, verbose=1):
+    # optional Numba-jitted versions of waxp/wcxp, taking an int64 array of features,
+    # used by the deletion based algorithms when Numba is installed
+    waxp_numba = None
+    wcxp_numba = None
+
+    def __init__(self, custom_object, verbose=1, n_workers=1,
+                 order='given', feature_priority=None, seed=None, cache_size=65536):
         """
         :param custom_object: some data structure that contains all the information needed
         :param verbose:
+        :param n_workers: number of threads running oracle calls in parallel,
+                            more than 1 requires clone_oracle.
+        :param order: order in which the deletion based algorithms test the features,
+                        'given', 'random' or 'heuristic'.
+        :param feature_priority: for 'heuristic', a callable or a sequence/dict giving
+                                    the priority of each feature, features with a higher
+                                    priority (more likely redundant) are tested first.
+        :param seed: seed of the random generator used by 'random'.
+        :param cache_size: number of oracle results kept by each enum cache (LRU),
+                            None for no limit.
         """
+        if order not in ('given', 'random', 'heuristic'):
+            raise ValueError(f'unknown order: {order}')
+        if order == 'heuristic' and feature_priority is None:
+            raise ValueError("order 'heuristic' requires feature_priority")
         self.custom_object = custom_object
         self.verbose = verbose
+        self.n_workers = n_workers
+        self.order = order
+        self.feature_priority = feature_priority
+        self._rng = random.Random(seed)
+        # persistent oracle, built by new_oracle when entering the outermost with-block
+        self.oracle = None
+        self._depth = 0
+        # independent oracles used by worker threads
+        self._clones = None
+        # oracle caches and set of all features, only alive during enum
+        self.cache_size = cache_size
+        self._axp_cache = None
+        self._cxp_cache = None
+        self._universe = None
 
     @abstractmethod
     def waxp(self, fixed, *additional_info):
@@ -27,6 +322,11 @@ class LogicXplainer(ABC):
             User-defined procedure waxp.
             Should test the custom_object with a list of fixed features and some additional information,
             and return the result.
+            It may also return (result, core): when the result is true, core is a subset of fixed
+            that is already a weak AXp (e.g. the assumptions in an unsatisfiable core),
+            letting axp_del drop the other features at once.
+            Inside the explanation procedures self.oracle holds the oracle built by new_oracle,
+            so waxp can pass the fixed features as assumptions instead of building a new solver.
         """
         pass
 
@@ -36,9 +336,234 @@ class LogicXplainer(ABC):
             User-defined procedure waxp.
             Should test the custom_object with a list of universal features and some additional information,
             and return the result.
+            It may also return (result, core): when the result is true, core is a subset of universal
+            that is already a weak CXp, letting cxp_del drop the other features at once.
+            Inside the explanation procedures self.oracle holds the oracle built by new_oracle,
+            so wcxp can pass the universal features as assumptions instead of building a new solver.
         """
         pass
 
+    def waxp_batch(self, candidates, *additional_info):
+        """
+            Test several lists of fixed features, used by check_axp.
+            Calls waxp on each candidate by default,
+            subclasses backed by a vectorized model can evaluate all candidates in one call.
+
+            :param candidates: a list of lists of fixed features.
+            :param additional_info: additional information.
+            :return: an iterable of truth values, one per candidate;
+                        the default is lazy, so check_* stops at the first true one.
+        """
+        return (self._waxp(fixed, *additional_info) for fixed in candidates)
+
+    def wcxp_batch(self, candidates, *additional_info):
+        """
+            Test several lists of universal features, used by check_cxp.
+            Calls wcxp on each candidate by default,
+            subclasses backed by a vectorized model can evaluate all candidates in one call.
+
+            :param candidates: a list of lists of universal features.
+            :param additional_info: additional information.
+            :return: an iterable of truth values, one per candidate;
+                        the default is lazy, so check_* stops at the first true one.
+        """
+        return (self._wcxp(universal, *additional_info) for universal in candidates)
+
+    def new_oracle(self):
+        """
+            User-defined procedure new_oracle (optional).
+            Should build a persistent oracle, e.g. an incremental SAT solver encoding custom_object.
+            It is stored in self.oracle and reused by all waxp/wcxp calls of one explanation procedure
+            (one enum run included), so learned clauses are kept between the calls.
+            Return None if waxp/wcxp do not need one.
+        """
+        return None
+
+    def __enter__(self):
+        if self._depth == 0:
+            self.oracle = self.new_oracle()
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth == 0:
+            if self.oracle is not None and hasattr(self.oracle, 'delete'):
+                self.oracle.delete()
+            self.oracle = None
+            if self._clones is not None:
+                while not self._clones.empty():
+                    self._clones.get().__exit__(None, None, None)
+                self._clones = None
+
+    def clone_oracle(self):
+        """
+            User-defined procedure clone_oracle.
+            Only needed when n_workers > 1.
+            Should return an independent explainer (e.g. with its own SAT solver)
+            whose waxp/wcxp can be called concurrently with the ones of self.
+        """
+        raise NotImplementedError('clone_oracle is required when n_workers > 1')
+
+    def _probe(self, oracle, feats, *additional_info):
+        """
+            Test removing each single feature of feats, in parallel.
+            By monotonicity, if removing a feature breaks the property,
+            then this feature belongs to every explanation contained in feats.
+
+            :param oracle: 'waxp' or 'wcxp'.
+            :param feats: a list of features.
+            :param additional_info: additional information.
+            :return: a list with, for each feature, the result and core of testing feats without it.
+        """
+        if self._clones is None:
+            self._clones = queue.SimpleQueue()
+            for _ in range(self.n_workers):
+                self._clones.put(self.clone_oracle().__enter__())
+        cache = self._axp_cache if oracle == 'waxp' else self._cxp_cache
+
+        def test(k):
+            cand = feats[:k] + feats[k + 1:]
+            clone = self._clones.get()
+            try:
+                return k, cand, _split(getattr(clone, oracle)(cand, *additional_info))
+            finally:
+                self._clones.put(clone)
+
+        probed = [None] * len(feats)
+        with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+            for fut in as_completed([pool.submit(test, k) for k in range(len(feats))]):
+                k, cand, res = fut.result()
+                if cache is not None:
+                    cache[frozenset(cand)] = res
+                probed[k] = res
+        return probed
+
+    def _test(self, oracle, feats, *additional_info):
+        """
+            Call waxp or wcxp, answering repeated queries from the cache when enum is running.
+
+            :param oracle: 'waxp' or 'wcxp'.
+            :param feats: a list of features.
+            :param additional_info: additional information.
+            :return: the result, and a core (or None).
+        """
+        cache = self._axp_cache if oracle == 'waxp' else self._cxp_cache
+        if cache is None:
+            return _split(getattr(self, oracle)(feats, *additional_info))
+        key = frozenset(feats)
+        res = cache.get(key)
+        if res is None:
+            # S is a weak AXp iff the other features are not a weak CXp,
+            # so an answer to the dual query is as good
+            dual = self._cxp_cache if oracle == 'waxp' else self._axp_cache
+            res = dual.get(self._universe - key)
+            if res is not None:
+                res = (not res[0], None)
+            else:
+                res = _split(getattr(self, oracle)(feats, *additional_info))
+            cache[key] = res
+        return res
+
+    def _waxp(self, fixed, *additional_info):
+        return self._test('waxp', fixed, *additional_info)[0]
+
+    def _wcxp(self, universal, *additional_info):
+        return self._test('wcxp', universal, *additional_info)[0]
+
+    def _del(self, oracle, feats, *additional_info):
+        """
+            Deletion based algorithm, shared by axp_del and cxp_del.
+
+            :param oracle: 'waxp' or 'wcxp'.
+            :param feats: a list of features.
+            :param additional_info: additional information.
+            :return: one explanation contained in feats.
+        """
+        if self.order == 'random':
+            feats = list(feats)
+            self._rng.shuffle(feats)
+        elif self.order == 'heuristic':
+            prio = self.feature_priority
+            feats = sorted(feats, key=prio if callable(prio) else prio.__getitem__, reverse=True)
+
+        jitted = getattr(self, f'{oracle}_numba')
+        del_njit = _get_del_njit() if jitted is not None else None
+        if del_njit is not None:
+            import numpy as np
+            feats_arr = np.asarray(feats, dtype=np.int64)
+            return del_njit(feats_arr, jitted, additional_info).tolist()
+
+        # present[k] tells whether feats[k] is still in the explanation
+        present = [True] * len(feats)
+        if self.n_workers > 1 and len(feats) > 1:
+            probed = self._probe(oracle, feats, *additional_info)
+        else:
+            probed = None
+        # true once some feature is dropped, the candidates then differ from the probed ones
+        dropped = False
+        for k in range(len(feats)):
+            if not present[k]:
+                continue
+            if probed is not None and not probed[k][0]:
+                # necessary in feats, hence in any subset
+                continue
+            present[k] = False
+            if probed is not None and not dropped:
+                res, core = probed[k]
+            else:
+                tmp = [i for i, p in zip(feats, present) if p]
+                res, core = self._test(oracle, tmp, *additional_info)
+            if not res:
+                present[k] = True
+                continue
+            dropped = True
+            if core is not None:
+                # the core is enough, drop the features not tested yet outside of it
+                core = set(core)
+                for j in range(k + 1, len(feats)):
+                    if feats[j] not in core:
+                        present[j] = False
+        return [i for i, p in zip(feats, present) if p]
+
+    def _prog(self, oracle, feats, *additional_info):
+        """
+            Progression with one-sided binary search.
+            Try to drop prefixes of growing size 1, 2, 4, ... of the remaining features;
+            when a drop fails, bisect for the first necessary feature in that prefix,
+            keep it and restart from size 1.
+            Uses O(k log(n/k)) oracle calls for an explanation of size k.
+
+            :param oracle: _waxp or _wcxp.
+            :param feats: a list of features.
+            :param additional_info: additional information.
+            :return: one explanation contained in feats.
+        """
+        if oracle([], *additional_info):
+            return []
+        # invariant: oracle(kept + rest) holds
+        kept = []
+        rest = feats
+        size = 1
+        while rest:
+            size = min(size, len(rest))
+            if oracle(kept + rest[size:], *additional_info):
+                rest = rest[size:]
+                size *= 2
+                continue
+            # dropping rest[:lo] works, dropping rest[:hi] does not
+            lo, hi = 0, size
+            while hi - lo > 1:
+                mid = (lo + hi) >> 1
+                if oracle(kept + rest[mid:], *additional_info):
+                    lo = mid
+                else:
+                    hi = mid
+            kept.append(rest[hi - 1])
+            rest = rest[hi:]
+            size = 1
+        return kept
+
     def axp_del(self, fixed, *additional_info):
         """
             Compute one abductive explanation (AXp) using deletion based algorithm.
@@ -49,17 +574,12 @@ class LogicXplainer(ABC):
                         each element in the return AXp is a feature index.
         """
 
-        time_start = time.perf_counter()
+        time_start = perf_counter() if self.verbose else 0.0
 
-        fix = fixed[:]
-        for i in fix:
-            tmp_fix = fix[:]
-            tmp_fix.remove(i)
-            if self.waxp(tmp_fix, *additional_info):
-                fix = tmp_fix
-        axp = fix
+        with self:
+            axp = self._del('waxp', fixed, *additional_info)
 
-        time_end = time.perf_counter()
+        time_end = perf_counter() if self.verbose else 0.0
 
         if self.verbose:
             if self.verbose == 1:
@@ -78,23 +598,12 @@ class LogicXplainer(ABC):
                         each element in the return AXp is a feature index.
         """
 
-        def qxp_recur(B, Z, newB=False):
-            if newB and self.waxp(B, *additional_info):
-                return []
-            if len(Z) == 1:
-                return Z
-            u = int(len(Z) / 2)
-            Z1 = Z[:u]
-            Z2 = Z[u:]
-            Q2 = qxp_recur(B + Z1, Z2, len(Z1) > 0)
-            Q1 = qxp_recur(B + Q2, Z1, len(Q2) > 0)
-            return Q1 + Q2
-
-        time_start = time.perf_counter()
+        time_start = perf_counter() if self.verbose else 0.0
 
-        axp = qxp_recur([], fixed, False)
+        with self:
+            axp = _qxp(self._waxp, fixed, *additional_info)
 
-        time_end = time.perf_counter()
+        time_end = perf_counter() if self.verbose else 0.0
 
         if self.verbose:
             if self.verbose == 1:
@@ -103,6 +612,30 @@ class LogicXplainer(ABC):
 
         return axp
 
+    def axp_prog(self, fixed, *additional_info):
+        """
+            Compute one abductive explanation (AXp) using progression with binary search.
+            Fewer oracle calls than axp_del when the AXp is small.
+            :param fixed: a list of features declared as fixed.
+            :param additional_info: additional information.
+            :return: one abductive explanation,
+                        each element in the return AXp is a feature index.
+        """
+
+        time_start = perf_counter() if self.verbose else 0.0
+
+        with self:
+            axp = self._prog(self._waxp, fixed, *additional_info)
+
+        time_end = perf_counter() if self.verbose else 0.0
+
+        if self.verbose:
+            if self.verbose == 1:
+                print(f"AXp (Prog): {axp}")
+            print("Runtime: {0:.3f}".format(time_end - time_start))
+
+        return axp
+
     def cxp_del(self, universal, *additional_info):
         """
             Compute one contrastive explanation (CXp) using deletion based algorithm.
@@ -113,17 +646,12 @@ class LogicXplainer(ABC):
                         each element in the return CXp is a feature index.
         """
 
-        time_start = time.perf_counter()
+        time_start = perf_counter() if self.verbose else 0.0
 
-        univ = universal[:]
-        for i in univ:
-            tmp_univ = univ[:]
-            tmp_univ.remove(i)
-            if self.wcxp(tmp_univ, *additional_info):
-                univ = tmp_univ
-        cxp = univ
+        with self:
+            cxp = self._del('wcxp', universal, *additional_info)
 
-        time_end = time.perf_counter()
+        time_end = perf_counter() if self.verbose else 0.0
 
         if self.verbose:
             if self.verbose == 1:
@@ -142,23 +670,12 @@ class LogicXplainer(ABC):
                         each element in the return CXp is a feature index.
         """
 
-        def qxp_recur(B, Z, newB=False):
-            if newB and self.wcxp(B, *additional_info):
-                return []
-            if len(Z) == 1:
-                return Z
-            u = int(len(Z) / 2)
-            Z1 = Z[:u]
-            Z2 = Z[u:]
-            Q2 = qxp_recur(B + Z1, Z2, len(Z1) > 0)
-            Q1 = qxp_recur(B + Q2, Z1, len(Q2) > 0)
-            return Q1 + Q2
+        time_start = perf_counter() if self.verbose else 0.0
 
-        time_start = time.perf_counter()
+        with self:
+            cxp = _qxp(self._wcxp, universal, *additional_info)
 
-        cxp = qxp_recur([], universal, False)
-
-        time_end = time.perf_counter()
+        time_end = perf_counter() if self.verbose else 0.0
 
         if self.verbose:
             if self.verbose == 1:
@@ -167,66 +684,113 @@ class LogicXplainer(ABC):
 
         return cxp
 
-    def enum(self, feats_idx, alg='del', *additional_info):
+    def cxp_prog(self, universal, *additional_info):
         """
-            Enumerate all (abductive and contrastive) explanations, using MARCO algorithm.
-            :param feats_idx: set of feature indices
-            :param alg: algorithm used to compute one explanation, 'del' or 'qxp'
+            Compute one contrastive explanation (CXp) using progression with binary search.
+            Fewer oracle calls than cxp_del when the CXp is small.
+            :param universal: a list of features declared as universal.
             :param additional_info: additional information.
-            :return: a list of all AXps, a list of all CXps.
+            :return: one contrastive explanation,
+                        each element in the return CXp is a feature index.
         """
 
-        #########################################
-        vpool = IDPool()
+        time_start = perf_counter() if self.verbose else 0.0
 
-        def new_var(name):
-            """
-                Inner function,
-                Find or new a PySAT variable.
-                See PySat.
+        with self:
+            cxp = self._prog(self._wcxp, universal, *additional_info)
 
-                :param name: name of variable
-                :return: index of variable
-            """
-            return vpool.id(f'{name}')
+        time_end = perf_counter() if self.verbose else 0.0
 
-        #########################################
+        if self.verbose:
+            if self.verbose == 1:
+                print(f"CXp (Prog): {cxp}")
+            print("Runtime: {0:.3f}".format(time_end - time_start))
+
+        return cxp
+
+    def enum(self, feats_idx, alg='del', *additional_info, map_solver=None, incremental=True,
+             compact=False, max_axps=None, max_cxps=None):
+        """
+            Enumerate all (abductive and contrastive) explanations, using MARCO algorithm.
+            :param feats_idx: set of feature indices
+            :param alg: algorithm used to compute one explanation, 'del', 'qxp' or 'prog'
+            :param additional_info: additional information.
+            :param map_solver: map solver, either a MapSolver instance over feats_idx,
+                                a callable building one from feats_idx, 'bitmap',
+                                or the name of a PySAT solver;
+                                by default a bitmap for a few features and CaDiCaL beyond.
+            :param incremental: incremental mode of the PySAT map solver, where supported.
+            :param compact: store each explanation as an array('i') instead of a list,
+                            saving memory when there are many of them.
+            :param max_axps: stop once this many AXps are found (None means all).
+            :param max_cxps: stop once this many CXps are found (None means all).
+            :return: a list of all AXps, a list of all CXps.
+        """
 
-        time_start = time.perf_counter()
+        time_start = perf_counter() if self.verbose else 0.0
 
+        axp_alg = {'del': self.axp_del, 'qxp': self.axp_qxp, 'prog': self.axp_prog}[alg]
+        cxp_alg = {'del': self.cxp_del, 'qxp': self.cxp_qxp, 'prog': self.cxp_prog}[alg]
         axps = []
         cxps = []
 
-        for i in feats_idx:
-            new_var(f'u_{i}')
-
-        with SAT_Solver(name="glucose4") as slv:
-            while slv.solve():
-                # first model is empty
-                model = slv.get_model()
-                univ = []
-                for lit in model:
-                    name = vpool.obj(abs(lit)).split(sep='_')
-                    univ.extend([int(name[1])] if lit > 0 else [])  # lit > 0 means universal
-                fix = [i for i in feats_idx if i not in univ]
-                if self.wcxp(univ, *additional_info):
-                    if alg == 'del':
-                        cxp = self.cxp_del(univ, *additional_info)
-                    elif alg == 'qxp':
-                        cxp = self.cxp_qxp(univ, *additional_info)
-                    # fix one feature next time
-                    slv.add_clause([-new_var(f'u_{i}') for i in cxp])
-                    cxps.append(cxp)
-                else:
-                    if alg == 'del':
-                        axp = self.axp_del(fix, *additional_info)
-                    elif alg == 'qxp':
-                        axp = self.axp_qxp(fix, *additional_info)
-                    # free one feature next time
-                    slv.add_clause([new_var(f'u_{i}') for i in axp])
-                    axps.append(axp)
-
-        time_end = time.perf_counter()
+        if max_cxps == 0 and max_axps is not None and max_axps <= 1:
+            # the first seed of MARCO fixes all features, no map solver needed
+            if max_axps == 1:
+                axp = axp_alg(list(feats_idx), *additional_info)
+                axps.append(array('i', axp) if compact else axp)
+        else:
+            # a bitmap is enough for a few features, PySAT is only needed beyond
+            if map_solver is None and len(feats_idx) <= BitmapMapSolver.max_feats:
+                map_solver = 'bitmap'
+            if isinstance(map_solver, MapSolver):
+                map_slv = map_solver
+            elif callable(map_solver):
+                map_slv = map_solver(feats_idx)
+            elif map_solver == 'bitmap':
+                map_slv = BitmapMapSolver(feats_idx)
+            elif map_solver is None:
+                map_slv = PySatMapSolver(feats_idx, incremental=incremental)
+            else:
+                map_slv = PySatMapSolver(feats_idx, name=map_solver, incremental=incremental)
+
+            # subsets recur across MARCO iterations, keep oracle results for the whole call,
+            # shared by waxp and wcxp queries through duality
+            self._axp_cache = _LRUCache(self.cache_size)
+            self._cxp_cache = _LRUCache(self.cache_size)
+            self._universe = frozenset(feats_idx)
+
+            try:
+                with self, map_slv:
+                    while map_slv.solve():
+                        univ = map_slv.model()
+                        univ_set = set(univ)
+                        fix = [i for i in feats_idx if i not in univ_set]
+                        if self._wcxp(univ, *additional_info):
+                            if max_cxps is not None and len(cxps) >= max_cxps:
+                                # enough CXps, univ is a weak CXp and blocks without minimizing
+                                map_slv.block_cxp(univ)
+                                continue
+                            cxp = cxp_alg(univ, *additional_info)
+                            map_slv.block_cxp(cxp)
+                            cxps.append(array('i', cxp) if compact else cxp)
+                        else:
+                            if max_axps is not None and len(axps) >= max_axps:
+                                # enough AXps, fix is a weak AXp and blocks without minimizing
+                                map_slv.block_axp(fix)
+                                continue
+                            axp = axp_alg(fix, *additional_info)
+                            map_slv.block_axp(axp)
+                            axps.append(array('i', axp) if compact else axp)
+                        if max_axps is not None and len(axps) >= max_axps \
+                                and max_cxps is not None and len(cxps) >= max_cxps:
+                            break
+            finally:
+                self._axp_cache = None
+                self._cxp_cache = None
+                self._universe = None
+
+        time_end = perf_counter() if self.verbose else 0.0
         if self.verbose:
             print('#AXp:', len(axps))
             print('#CXp:', len(cxps))
@@ -243,19 +807,19 @@ class LogicXplainer(ABC):
                         else false.
         """
 
-        fix = axp[:]
-        # 1) a weak AXp ?
-        if not self.waxp(fix, *additional_info):
-            print(f'{axp} is not a weak AXp')
-            return False
-        # 2) subset-minimal ?
-        for i in fix:
-            tmp_fix = fix[:]
-            tmp_fix.remove(i)
-            if self.waxp(tmp_fix, *additional_info):
+        # explanations from enum(compact=True) are arrays, oracles get lists
+        axp = list(axp)
+        with self:
+            # 1) a weak AXp ?
+            if not self._waxp(axp, *additional_info):
+                print(f'{axp} is not a weak AXp')
+                return False
+            # 2) subset-minimal ?
+            cands = [axp[:k] + axp[k + 1:] for k in range(len(axp))]
+            if any(self.waxp_batch(cands, *additional_info)):
                 print(f'{axp} is not subset-minimal')
                 return False
-        return True
+            return True
 
     def check_cxp(self, cxp, *additional_info):
         """
@@ -266,16 +830,16 @@ class LogicXplainer(ABC):
                         else false.
         """
 
-        univ = cxp[:]
-        # 1) a weak CXp ?
-        if not self.wcxp(univ, *additional_info):
-            print(f'{cxp} is not a weak CXp')
-            return False
-        # 2) subset-minimal ?
-        for i in univ:
-            tmp_univ = univ[:]
-            tmp_univ.remove(i)
-            if self.wcxp(tmp_univ, *additional_info):
+        # explanations from enum(compact=True) are arrays, oracles get lists
+        cxp = list(cxp)
+        with self:
+            # 1) a weak CXp ?
+            if not self._wcxp(cxp, *additional_info):
+                print(f'{cxp} is not a weak CXp')
+                return False
+            # 2) subset-minimal ?
+            cands = [cxp[:k] + cxp[k + 1:] for k in range(len(cxp))]
+            if any(self.wcxp_batch(cands, *additional_info)):
                 print(f'{cxp} is not subset-minimal')
                 return False
-        return True
+            return True